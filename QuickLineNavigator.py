@@ -2,33 +2,98 @@ import sublime
 import sublime_plugin
 import os
 import re
+import stat
 import json
+import shutil
 import threading
 import time
 import queue
 import subprocess
 import unicodedata
-from collections import defaultdict
+import bisect
+import codecs
+import multiprocessing
+from itertools import accumulate, islice
+from concurrent.futures import ThreadPoolExecutor
 
 SETTINGS_FILE = "Default.sublime-settings"
-SUPPORTED_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin1', 'cp1252', 'shift_jis']
-DEFAULT_BLACKLIST = ['.exe', '.dll', '.so', '.dylib', '.a', '.lib', '.obj', '.o', '.bin', '.class', '.jar', '.war', '.ear', '.pyc', '.pyo', '.pyd', '.db', '.sqlite', '.sqlite3', '.dat', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.ico', '.webp', '.svg', '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.webm', '.wav', '.m4a', '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz', '.iso', '.img', '.dmg', '.deb', '.rpm', '.msi', '.ttf', '.otf', '.woff', '.woff2', '.eot', '.sublime-workspace', '.sublime-project', '.git', '.svn', '.hg', '.tmp', '.cache', '.log', '.swp', '.swo', '.swn', '.bak', '~']
+SETTINGS_CHANGE_KEY = "QuickLineNavigator"
+SUPPORTED_ENCODINGS = ['utf-8', 'gbk', 'utf-16', 'latin1']
+BINARY_SNIFF_SIZE = 4096
+UTF16_BOMS = (b'\xff\xfe', b'\xfe\xff')
+BOM_ENCODINGS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+DEFAULT_BLACKLIST_EXTS = ('.exe', '.dll', '.so', '.dylib', '.a', '.lib', '.obj', '.o', '.bin', '.class', '.jar', '.war', '.ear', '.pyc', '.pyo', '.pyd', '.db', '.sqlite', '.sqlite3', '.dat', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.ico', '.webp', '.svg', '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.webm', '.wav', '.m4a', '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz', '.iso', '.img', '.dmg', '.deb', '.rpm', '.msi', '.ttf', '.otf', '.woff', '.woff2', '.eot', '.sublime-workspace', '.sublime-project', '.git', '.svn', '.hg', '.tmp', '.cache', '.log', '.swp', '.swo', '.swn', '.bak', '~')
+DEFAULT_BLACKLIST = frozenset(DEFAULT_BLACKLIST_EXTS)
+DEFAULT_BLACKLIST_GLOBS = tuple('*' + ext for ext in DEFAULT_BLACKLIST_EXTS)
+DEFAULT_BLACKLIST_NAMES = tuple(ext.lstrip('.') for ext in DEFAULT_BLACKLIST_EXTS)
+SKIP_EXTS = frozenset(['.git', '.svn', '.hg', '.sublime-workspace', '.sublime-project'])
+SKIP_DIRS = frozenset(['.git', '.svn', '.hg', '__pycache__'])
+UGREP_CRITICAL_EXCLUDES = ('*.sublime-workspace', '*.sublime-project', '*.git', '*.svn', '*.hg', '*.exe', '*.dll', '*.so', '*.dylib', '*.bin')
 
 HIGHLIGHT_SCOPES = ['region.redish', 'region.bluish', 'region.yellowish', 'region.greenish', 'region.purplish', 'region.orangish', 'selection']
 HIGHLIGHT_ICONS = ['dot', 'circle', 'cross', 'bookmark', 'dot', 'circle', 'bookmark']
 KEYWORD_EMOJIS = ['🟥', '🟦', '🟨', '🟩', '🟪', '🟧', '⬜']
+KEYWORD_TOKEN_PATTERN = re.compile(r'`([^`]*)`?|([^ `]+)')
+KEYWORD_QUOTE_PATTERN = re.compile(r"[ '`]")
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7f]')
+UGREP_LINE_PATTERN = re.compile(br'^((?:[A-Za-z]:)?[^:\n]+):(\d+):([^\n]*?)\r*$', re.MULTILINE)
+UGREP_READ_SIZE = 1 << 16
+MISSING = object()
+
+WIDE_CHAR_RANGES = [
+    (0x1F300, 0x1F9FF), (0x1F000, 0x1F0FF), (0x1F100, 0x1F1FF), (0x1F200, 0x1F2FF),
+    (0x1F600, 0x1F64F), (0x1F680, 0x1F6FF), (0x1F700, 0x1F77F), (0x2600, 0x27BF),
+    (0x1FA00, 0x1FA6F), (0x1FA70, 0x1FAFF)
+]
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return tuple(lo for lo, _ in merged), tuple(hi for _, hi in merged)
+
+
+WIDE_CHAR_STARTS, WIDE_CHAR_ENDS = _merge_ranges(WIDE_CHAR_RANGES)
+EAST_ASIAN_WIDE = frozenset(['F', 'W', 'A'])
+
+MENU_ITEMS = [
+    "📄 Search in Current File　　　　　　　1 🔍 Search Commands",
+    "📁 Search in Project　　　　　　　　　2 🔍 Search Commands",
+    "📂 Search in Folder　　　　　　　　　 3 🔍 Search Commands",
+    "📑 Search in Open Files　　　　　　　 4 🔍 Search Commands",
+    "🔄 Toggle Filters (Permanent)　　　　  5 🎛️ Filter Controls",
+    "⏱️ Toggle Filters (Temporary)　　　　  6 🎛️ Filter Controls",
+    "📊 Show Filter Status　　　　　　　　 7 🎛️ Filter Controls",
+    "📍 Set Search Folder　　　　　　　　  8 📁 Folder Settings",
+    "🗑️ Clear Search Folder　　　　　　　  9 📁 Folder Settings"
+]
+MENU_COMMANDS = (
+    ("qln", {"scope": "file"}),
+    ("qln", {"scope": "project"}),
+    ("qln", {"scope": "folder"}),
+    ("qln_open_files", {}),
+    ("qln_toggle_extension_filters", {}),
+    ("qln_toggle_extension_filters_temporary", {}),
+    ("qln_show_filter_status", {}),
+    ("qln_set_search_folder", {}),
+    ("qln_clear_search_folder", {})
+)
 
 
 class KeywordStateManager:
     def __init__(self):
         self.active_panel = None
         self.stored_keywords = ""
-        self.debug_enabled = True
+        self.debug_enabled = False
         self.is_panel_switching = False
 
-    def debug_print(self, message):
+    def debug_print(self, message, *args):
         if self.debug_enabled:
-            print("🔍 [KeywordState] {0}".format(message))
+            print("🔍 [KeywordState] {0}".format(message.format(*args) if args else message))
 
     def has_active_panel(self):
         result = self.active_panel is not None
@@ -46,7 +111,7 @@ class KeywordStateManager:
         self.active_panel = panel_info
         cid = panel_info.get('command_id', 'Unknown')
         scope = panel_info.get('scope', 'None')
-        self.debug_print("set_active_panel(): command={0}, scope={1}".format(cid, scope))
+        self.debug_print("set_active_panel(): command={0}, scope={1}", cid, scope)
 
     def clear_active_panel(self):
         self.active_panel = None
@@ -64,11 +129,11 @@ class KeywordStateManager:
         if selected_text:
             formatted = TextUtils.format_keyword_for_input(selected_text)
             result = self._ensure_trailing_space(formatted)
-            self.debug_print("Using selected text: '{0}'".format(result))
+            self.debug_print("Using selected text: '{0}'", result)
             return result
         if self.is_panel_switching:
             result = self._ensure_trailing_space(self.stored_keywords)
-            self.debug_print("Switching: using stored keywords: '{0}'".format(result))
+            self.debug_print("Switching: using stored keywords: '{0}'", result)
             return result
         self.debug_print("Fresh run: not using stored keywords")
         return ""
@@ -76,7 +141,7 @@ class KeywordStateManager:
     def save_current_keywords(self, text):
         if text:
             self.stored_keywords = text
-            self.debug_print("save_current_keywords(): '{0}'".format(text))
+            self.debug_print("save_current_keywords(): '{0}'", text)
 
     def handle_panel_append_selection(self, selected_text, current_text):
         if not selected_text:
@@ -109,7 +174,7 @@ class KeywordStateManager:
             new_text = "{0}{1}".format(stored_keywords or "", formatted_selected)
 
         result = self._ensure_trailing_space(new_text)
-        self.debug_print("Cross-scope append -> '{0}'".format(result))
+        self.debug_print("Cross-scope append -> '{0}'", result)
         return result
 
     def _ensure_trailing_space(self, text):
@@ -122,40 +187,102 @@ class KeywordStateManager:
 
 
 class Settings:
-    def __init__(self):
-        self._settings = sublime.load_settings(SETTINGS_FILE)
-        self._cache = {}
+    _settings = None
+    _cache = {}
+    _user_json_cache = None
+    _user_json_mtime = None
+    _user_json_lock = threading.Lock()
+
+    @classmethod
+    def _load(cls):
+        if cls._settings is None:
+            cls._settings = sublime.load_settings(SETTINGS_FILE)
+            cls._settings.add_on_change(SETTINGS_CHANGE_KEY, cls.clear_cache)
+        return cls._settings
 
     def get(self, key, default=None):
-        if key not in self._cache:
-            self._cache[key] = self._settings.get(key, default)
-        return self._cache[key]
+        value = self._cache.get(key, MISSING)
+        if value is MISSING:
+            value = self._cache[key] = self._load().get(key, default)
+        return value
+
+    def get_many(self, defaults):
+        return {key: self.get(key, default) for key, default in defaults.items()}
 
     def set(self, key, value):
         self._cache[key] = value
-        self._settings.set(key, value)
+        self._load().set(key, value)
         sublime.save_settings(SETTINGS_FILE)
 
-    def clear_cache(self):
-        self._cache.clear()
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+        FileFilter.clear_instances()
+        DisplayFormatter.clear_instance()
+
+    @classmethod
+    def release(cls):
+        if cls._settings is not None:
+            cls._settings.clear_on_change(SETTINGS_CHANGE_KEY)
+            cls._settings = None
+        cls._cache.clear()
+        DisplayFormatter.clear_instance()
 
     def update_user_settings(self, key, value):
         user_path = os.path.join(sublime.packages_path(), "User", SETTINGS_FILE)
-        settings_data = {}
-        if os.path.exists(user_path):
-            try:
-                with open(user_path, 'r', encoding='utf-8') as f:
-                    settings_data = json.load(f)
-            except:
-                pass
-        settings_data[key] = value
-        os.makedirs(os.path.dirname(user_path), exist_ok=True)
-        with open(user_path, 'w', encoding='utf-8') as f:
-            json.dump(settings_data, f, indent=4, ensure_ascii=False)
+        with Settings._user_json_lock:
+            settings_data = self._load_user_settings(user_path)
+            changed = key not in settings_data or settings_data[key] != value
+            settings_data[key] = value
+            snapshot = dict(settings_data)
+        if changed:
+            sublime.set_timeout_async(lambda: self._write_user_settings(user_path, snapshot), 0)
         self.set(key, value)
 
+    @classmethod
+    def _load_user_settings(cls, user_path):
+        try:
+            mtime = os.path.getmtime(user_path)
+        except OSError:
+            mtime = None
+        if cls._user_json_cache is None or mtime != cls._user_json_mtime:
+            settings_data = {}
+            if mtime is not None:
+                try:
+                    with open(user_path, 'r', encoding='utf-8') as f:
+                        settings_data = json.load(f)
+                except:
+                    pass
+            cls._user_json_cache = settings_data
+            cls._user_json_mtime = mtime
+        return cls._user_json_cache
+
+    @classmethod
+    def _write_user_settings(cls, user_path, settings_data):
+        with cls._user_json_lock:
+            os.makedirs(os.path.dirname(user_path), exist_ok=True)
+            with open(user_path, 'w', encoding='utf-8') as f:
+                json.dump(settings_data, f, indent=4, ensure_ascii=False)
+            cls._user_json_mtime = os.path.getmtime(user_path)
+
 
 class FileFilter:
+    _instances = {}
+
+    @classmethod
+    def for_scope(cls, settings, scope, window=None):
+        window_id = window.id() if window else 0
+        key = (scope, window_id, temp_filter_overrides.get(window_id))
+        file_filter = cls._instances.get(key)
+        if file_filter is None:
+            file_filter = cls(settings, scope, window)
+            cls._instances[key] = file_filter
+        return file_filter
+
+    @classmethod
+    def clear_instances(cls):
+        cls._instances.clear()
+
     def __init__(self, settings, scope, window=None):
         self.settings = settings
         self.scope = scope
@@ -163,10 +290,24 @@ class FileFilter:
         self.enabled = self._get_filter_enabled()
         self.whitelist = settings.get("file_extensions", [])
         self.blacklist = settings.get("file_extensions_blacklist", [])
+        self._blacklist_set = {('.' + e.lstrip('.').lower() if e and e != '.' else e) for e in self.blacklist or []}
+        self._allow_all = False
+        self._allow_no_ext = False
+        self._whitelist_set = set()
+        for e in self.whitelist or []:
+            e = e.strip().lower()
+            if e == ".":
+                self._allow_all = True
+                break
+            elif e == "":
+                self._allow_no_ext = True
+            else:
+                self._whitelist_set.add('.' + e.lstrip('.'))
+        self._decision_cache = {}
 
     def _get_filter_enabled(self):
-        if self.window and hasattr(self.window, 'extension_filters_temp_override'):
-            return self.window.extension_filters_temp_override
+        if self.window and self.window.id() in temp_filter_overrides:
+            return temp_filter_overrides[self.window.id()]
         scope_map = {
             'file': 'extension_filters_file',
             'folder': 'extension_filters_folder',
@@ -183,36 +324,45 @@ class FileFilter:
         if not filename:
             return False
         basename = os.path.basename(filename)
-        _, ext = os.path.splitext(filename.lower())
-        if ext in {'.git', '.svn', '.hg', '.sublime-workspace', '.sublime-project'} or basename.startswith('.'):
+        if basename.startswith('.'):
+            return False
+        dot = basename.rfind('.')
+        ext = basename[dot:].lower() if dot > 0 else ""
+        decision = self._decision_cache.get(ext)
+        if decision is None:
+            decision = self._decide(ext)
+            self._decision_cache[ext] = decision
+        return decision
+
+    def iter_files(self, folder, deadline=None):
+        should_process = self.should_process
+        join = os.path.join
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for fname in files:
+                if deadline is not None and time.time() > deadline:
+                    raise TimeoutError(root)
+                if should_process(fname):
+                    yield join(root, fname)
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(root)
+
+    def _decide(self, ext):
+        if ext in SKIP_EXTS:
             return False
         if ext in DEFAULT_BLACKLIST:
             return False
         if not self.enabled:
             return True
-        if self.blacklist:
-            blacklist_set = {('.' + e.lstrip('.').lower() if e and e != '.' else e) for e in self.blacklist}
-            if ext in blacklist_set:
-                return False
+        if ext in self._blacklist_set:
+            return False
         if not self.whitelist:
             return True
-        allow_all = False
-        allow_no_ext = False
-        whitelist_set = set()
-        for e in self.whitelist:
-            e = e.strip().lower()
-            if e == ".":
-                allow_all = True
-                break
-            elif e == "":
-                allow_no_ext = True
-            else:
-                whitelist_set.add('.' + e.lstrip('.'))
-        if allow_all:
+        if self._allow_all:
             return True
-        if ext == "" and allow_no_ext:
+        if ext == "" and self._allow_no_ext:
             return True
-        return ext in whitelist_set
+        return ext in self._whitelist_set
 
 
 class FileScanEstimator:
@@ -233,7 +383,7 @@ class FileScanEstimator:
     def count_filtered_files(cls, folders, settings, scope, window=None, timeout=0.8, max_files=200000, cache_ttl=None):
         if not folders:
             return 0, False
-        file_filter = FileFilter(settings, scope, window)
+        file_filter = FileFilter.for_scope(settings, scope, window)
         key = cls._make_cache_key(folders, file_filter)
         now = time.time()
         ttl = cls.CACHE_TTL if cache_ttl is None else cache_ttl
@@ -241,23 +391,22 @@ class FileScanEstimator:
             ts, value = cls._cache[key]
             if (now - ts) <= ttl:
                 return value
-        start = now
+        deadline = now + timeout
         count = 0
         approx = False
         try:
             for root in folders:
                 if not root or not os.path.isdir(root):
                     continue
-                for dirpath, dirnames, filenames in os.walk(root):
-                    for fname in filenames:
-                        fpath = os.path.join(dirpath, fname)
-                        if file_filter.should_process(fpath):
-                            count += 1
-                        if count >= max_files or (time.time() - start) > timeout:
-                            approx = True
-                            raise StopIteration
+                for fpath in file_filter.iter_files(root, deadline):
+                    count += 1
+                    if count >= max_files:
+                        approx = True
+                        raise StopIteration
         except StopIteration:
             pass
+        except TimeoutError:
+            approx = True
         except Exception:
             approx = True
         if ttl:
@@ -266,116 +415,105 @@ class FileScanEstimator:
 
 
 class TextUtils:
+    _eaw_cache = {}
+    _width_table = dict((chr(i), 1) for i in range(128))
+
     @staticmethod
     def display_width(s):
         if not s:
             return 0
         if len(s) == 1:
-            ch = s[0]
-            if ord(ch) < 128:
-                return 1
-            elif ('\U0001F300' <= ch <= '\U0001F9FF' or
-                  '\U0001F000' <= ch <= '\U0001F0FF' or
-                  '\U0001F100' <= ch <= '\U0001F1FF' or
-                  '\U0001F200' <= ch <= '\U0001F2FF' or
-                  '\U0001F600' <= ch <= '\U0001F64F' or
-                  '\U0001F680' <= ch <= '\U0001F6FF' or
-                  '\U0001F700' <= ch <= '\U0001F77F' or
-                  '\U00002600' <= ch <= '\U000027BF' or
-                  '\U0001FA00' <= ch <= '\U0001FA6F' or
-                  '\U0001FA70' <= ch <= '\U0001FAFF'):
-                return 2
-            else:
-                ea_width = unicodedata.east_asian_width(ch)
-                return 2 if ea_width in ('F', 'W', 'A') else 1
-        if all(ord(c) < 128 for c in s):
+            return TextUtils._char_display_width(s)
+        if NON_ASCII_PATTERN.search(s) is None:
             return len(s)
-        width = 0
-        for ch in s:
-            if ('\U0001F300' <= ch <= '\U0001F9FF' or
-                '\U0001F000' <= ch <= '\U0001F0FF' or
-                '\U0001F100' <= ch <= '\U0001F1FF' or
-                '\U0001F200' <= ch <= '\U0001F2FF' or
-                '\U0001F600' <= ch <= '\U0001F64F' or
-                '\U0001F680' <= ch <= '\U0001F6FF' or
-                '\U0001F700' <= ch <= '\U0001F77F' or
-                '\U00002600' <= ch <= '\U000027BF' or
-                '\U0001FA00' <= ch <= '\U0001FA6F' or
-                '\U0001FA70' <= ch <= '\U0001FAFF'):
-                width += 2
-            else:
-                ea_width = unicodedata.east_asian_width(ch)
-                width += 2 if ea_width in ('F', 'W', 'A') else 1
+        return sum(TextUtils.char_widths(s))
+
+    @staticmethod
+    def char_widths(s):
+        widths = TextUtils._width_table
+        missing = set(s).difference(widths)
+        if missing:
+            char_width = TextUtils._char_display_width
+            for ch in missing:
+                widths[ch] = char_width(ch)
+        return map(widths.__getitem__, s)
+
+    @staticmethod
+    def _char_display_width(ch):
+        code_point = ord(ch)
+        if code_point < 128:
+            return 1
+        i = bisect.bisect_right(WIDE_CHAR_STARTS, code_point)
+        if i and code_point <= WIDE_CHAR_ENDS[i - 1]:
+            return 2
+        width = TextUtils._eaw_cache.get(ch)
+        if width is None:
+            width = 2 if unicodedata.east_asian_width(ch) in EAST_ASIAN_WIDE else 1
+            TextUtils._eaw_cache[ch] = width
         return width
 
     @staticmethod
     def parse_keywords(input_text):
         if not input_text:
             return []
-        keywords = []
-        current = ""
-        in_backticks = False
-        i = 0
-        while i < len(input_text):
-            char = input_text[i]
-            if char == '`' and not in_backticks:
-                if current.strip():
-                    keywords.append(current.strip())
-                    current = ""
-                in_backticks = True
-                i += 1
-                continue
-            elif char == '`' and in_backticks:
-                in_backticks = False
-                if current.strip():
-                    keywords.append(current.strip())
-                current = ""
-                i += 1
-                continue
-            elif char == ' ' and not in_backticks:
-                if current.strip():
-                    keywords.append(current.strip())
-                current = ""
-                i += 1
-                continue
-            else:
-                current += char
-                i += 1
-        if current.strip():
-            keywords.append(current.strip())
         final_keywords = []
-        for kw in keywords:
-            if kw and ('\r' in kw or '\n' in kw):
-                lines = kw.replace('\r\n', '\n').replace('\r', '\n').split('\n')
-                for line in lines:
+        for match in KEYWORD_TOKEN_PATTERN.finditer(input_text):
+            kw = match.group(1)
+            if kw is None:
+                kw = match.group(2)
+            kw = kw.strip()
+            if not kw:
+                continue
+            if '\r' in kw or '\n' in kw:
+                for line in kw.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
                     line = line.strip()
                     if line:
                         final_keywords.append(line)
-            elif kw:
+            else:
                 final_keywords.append(kw)
         return final_keywords
 
     @staticmethod
     def format_keyword_for_input(keyword):
+        if KEYWORD_QUOTE_PATTERN.search(keyword) is None:
+            return keyword
         if '`' in keyword:
             return '"{}"'.format(keyword)
-        elif ' ' in keyword or "'" in keyword:
-            return '`{}`'.format(keyword)
-        return keyword
+        return '`{}`'.format(keyword)
 
 
 class UgrepExecutor:
-    def __init__(self):
-        self.path = self._find_executable()
-        self.output_pattern = re.compile(r'^([^:]+):(\d+):(.*)$')
-        self.windows_pattern = re.compile(r'^([A-Za-z]:[^:]+):(\d+):(.*)$')
+    _path_cache = None
+    _path_resolved = False
+
+    @property
+    def path(self):
+        if not UgrepExecutor._path_resolved:
+            UgrepExecutor._path_cache = self._find_executable()
+            UgrepExecutor._path_resolved = True
+        return UgrepExecutor._path_cache
 
     def _find_executable(self):
+        cache_file = self._path_cache_file()
+        if cache_file:
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached = f.read().strip()
+                if cached and os.path.isfile(cached):
+                    return cached
+            except OSError:
+                pass
         try:
-            import shutil
             found = shutil.which("ugrep")
             if found:
                 print("🔧 Found ugrep at: {}".format(found))
+                if cache_file:
+                    try:
+                        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                        with open(cache_file, 'w', encoding='utf-8') as f:
+                            f.write(found)
+                    except OSError:
+                        pass
                 return found
         except Exception as e:
             print("🔧 Error finding ugrep: {}".format(e))
@@ -383,13 +521,29 @@ class UgrepExecutor:
         print("   See: https://github.com/Genivia/ugrep#install")
         return None
 
+    @staticmethod
+    def _path_cache_file():
+        try:
+            cache_dir = sublime.cache_path()
+        except Exception:
+            return None
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, "QuickLineNavigator", "ugrep_path")
+
+    @classmethod
+    def invalidate(cls):
+        cls._path_cache = None
+        cls._path_resolved = False
+
     def search(self, paths, keywords, file_filter):
         if not self.path:
             return []
         cmd = [self.path, "-n", "-H", "--color=never", "-r", "-I", "-i", "-F"]
+        for name in SKIP_DIRS:
+            cmd.extend(["--exclude-dir", name])
         if not file_filter.enabled:
-            critical_blacklist = ["*.sublime-workspace", "*.sublime-project", "*.git", "*.svn", "*.hg", "*.exe", "*.dll", "*.so", "*.dylib", "*.bin"]
-            for pattern in critical_blacklist:
+            for pattern in UGREP_CRITICAL_EXCLUDES:
                 cmd.extend(["--exclude", pattern])
         else:
             self._apply_filters(cmd, file_filter)
@@ -399,15 +553,16 @@ class UgrepExecutor:
         else:
             self._add_keywords(cmd, keywords)
         cmd.extend(paths if isinstance(paths, list) else [paths])
-        print("  🔧 Ugrep: {0}".format(" ".join(str(arg) for arg in cmd)))
-        output, error = self._execute(cmd)
-        if error:
-            print("  ❌ Ugrep error: {0}".format(error))
-        results = self._parse_output(output)
-        print("  ✅ Ugrep found {0} lines".format(len(results)))
+        lines = ["  🔧 Ugrep: {0}".format(" ".join(str(arg) for arg in cmd))]
+        errors = []
+        results = self._parse_output(self._execute(cmd, errors))
+        if errors:
+            lines.append("  ❌ Ugrep error: {0}".format("; ".join(errors)))
+        lines.append("  ✅ Ugrep found {0} lines".format(len(results)))
         if file_filter.enabled and self._needs_post_filter(file_filter):
             results = self._post_filter(results, file_filter)
-            print("  🔧 Post-filtered to {0} lines".format(len(results)))
+            lines.append("  🔧 Post-filtered to {0} lines".format(len(results)))
+        print("\n".join(lines))
         return results
 
     def _add_keywords(self, cmd, keywords):
@@ -442,7 +597,7 @@ class UgrepExecutor:
                 applied_whitelist = True
         blacklist = set()
         if not applied_whitelist:
-            blacklist.update(["*{0}".format(ext) for ext in DEFAULT_BLACKLIST])
+            blacklist.update(DEFAULT_BLACKLIST_GLOBS)
         if file_filter.blacklist:
             for ext in file_filter.blacklist:
                 ext = ext.strip().lower()
@@ -451,54 +606,84 @@ class UgrepExecutor:
         for pattern in blacklist:
             cmd.extend(["--exclude", pattern])
 
-    def _execute(self, cmd):
-        try:
-            kwargs = {}
-            if sublime.platform() == "windows":
-                if hasattr(subprocess, 'CREATE_NO_WINDOW'):
-                    kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
-                else:
-                    kwargs['creationflags'] = 0x08000000
-            if hasattr(subprocess, 'run'):
-                result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=30, **kwargs)
-                return result.stdout, result.stderr
+    def _execute(self, cmd, errors, timeout=30):
+        kwargs = {}
+        if sublime.platform() == "windows":
+            if hasattr(subprocess, 'CREATE_NO_WINDOW'):
+                kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
             else:
-                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
-                stdout, stderr = process.communicate(timeout=30)
-                if isinstance(stdout, bytes):
-                    stdout = stdout.decode('utf-8', errors='ignore')
-                if isinstance(stderr, bytes):
-                    stderr = stderr.decode('utf-8', errors='ignore')
-                return stdout, stderr
-        except subprocess.TimeoutExpired:
-            if 'process' in locals():
-                process.kill()
-                process.communicate()
-            return "", "Timeout after 30 seconds"
+                kwargs['creationflags'] = 0x08000000
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
         except OSError as e:
             if e.errno == 2:
-                return "", "ugrep not found"
+                errors.append("ugrep not found")
             elif e.errno == 13:
-                return "", "Permission denied"
+                errors.append("Permission denied")
             else:
-                return "", "System error: {0}".format(str(e))
+                errors.append("System error: {0}".format(str(e)))
+            return
         except Exception as e:
-            return "", "Error: {0}".format(str(e))
-
-    def _parse_output(self, output):
+            errors.append("Error: {0}".format(str(e)))
+            return
+        stderr_chunks = []
+        stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()))
+        stderr_thread.daemon = True
+        stderr_thread.start()
+        timed_out = []
+        def kill():
+            timed_out.append(True)
+            try:
+                process.kill()
+            except OSError:
+                pass
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            pending = b''
+            while True:
+                chunk = process.stdout.read1(UGREP_READ_SIZE)
+                if not chunk:
+                    break
+                pending += chunk
+                cut = pending.rfind(b'\n') + 1
+                if cut:
+                    yield pending[:cut]
+                    pending = pending[cut:]
+            if pending:
+                yield pending
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr_thread.join(1)
+            process.stderr.close()
+        if timed_out:
+            errors.append("Timeout after {0} seconds".format(timeout))
+        elif stderr_chunks and stderr_chunks[0]:
+            errors.append(stderr_chunks[0].decode('utf-8', errors='ignore').strip())
+
+    def _parse_output(self, blocks):
         results = []
-        for line in output.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            match = self.windows_pattern.match(line) or self.output_pattern.match(line)
-            if match:
+        paths = {}
+        find_lines = UGREP_LINE_PATTERN.finditer
+        for block in blocks:
+            for match in find_lines(block):
+                raw_path, line_number, text = match.groups()
+                file_path = paths.get(raw_path)
+                if file_path is None:
+                    file_path = paths[raw_path] = raw_path.decode('utf-8', errors='ignore')
+                text = text.decode('utf-8', errors='ignore')
+                line_number = int(line_number)
                 results.append({
-                    'file': match.group(1),
-                    'line_number': int(match.group(2)),
-                    'line': match.group(3),
-                    'display': match.group(3).strip(),
-                    'point': int(match.group(2))
+                    'file': file_path,
+                    'line_number': line_number,
+                    'line': text,
+                    'display': text.strip(),
+                    'point': line_number
                 })
         return results
 
@@ -549,20 +734,22 @@ class ShowSearchEngineStatusCommand(sublime_plugin.WindowCommand):
 
 
 class SearchEngine:
+    _ugrep_warning_shown = False
+
     def __init__(self, settings, scope, window=None):
         self.settings = settings
         self.scope = scope
         self.window = window
-        self.file_filter = FileFilter(settings, scope, window)
+        self.file_filter = FileFilter.for_scope(settings, scope, window)
         self.ugrep = UgrepExecutor()
-        if not self.ugrep.path and not getattr(SearchEngine, '_ugrep_warning_shown', False):
+        if not self.ugrep.path and not SearchEngine._ugrep_warning_shown:
             self._show_ugrep_installation_info()
             SearchEngine._ugrep_warning_shown = True
 
-    def _line_matches(self, display_text, keywords):
-        if not keywords:
+    def _line_matches(self, line_lower, lower_keywords):
+        if not lower_keywords:
             return True
-        return all(re.search(re.escape(kw), display_text, re.IGNORECASE) for kw in keywords)
+        return all(kw in line_lower for kw in lower_keywords)
 
     def _show_ugrep_installation_info(self):
         def show_dialog():
@@ -599,24 +786,24 @@ class SearchEngine:
         else:
             return self._search_folders(paths, keywords)
 
-    def _search_file(self, file_path, keywords):
+    def _search_file(self, file_path, keywords, view=None):
         if not self.window:
             return []
-        view = None
-        for v in self.window.views():
-            if v.file_name() == file_path:
-                view = v
-                break
+        if view is None:
+            for v in self.window.views():
+                if v.file_name() == file_path:
+                    view = v
+                    break
         if not view:
             return []
+        if not keywords:
+            return self._search_all_lines(view, file_path)
         results = []
-        for region in view.lines(sublime.Region(0, view.size())):
+        for region in self._find_matching_lines(view, keywords):
             line_text = view.substr(region)
             display_text = line_text.strip()
             if not display_text:
                 continue
-            if not self._line_matches(display_text, keywords):
-                continue
             line_num = view.rowcol(region.begin())[0] + 1
             results.append({
                 'file': file_path,
@@ -627,99 +814,178 @@ class SearchEngine:
             })
         return results
 
+    def _search_all_lines(self, view, file_path):
+        text = view.substr(sublime.Region(0, view.size()))
+        results = []
+        offset = 0
+        for line_num, line_text in enumerate(text.split('\n'), 1):
+            display_text = line_text.strip()
+            if display_text:
+                results.append({
+                    'file': file_path,
+                    'line_number': line_num,
+                    'line': line_text,
+                    'display': display_text,
+                    'point': offset
+                })
+            offset += len(line_text) + 1
+        return results
+
+    def _find_matching_lines(self, view, keywords):
+        flags = sublime.IGNORECASE | sublime.LITERAL
+        lines = None
+        for kw in keywords:
+            found = {}
+            line_end = -1
+            for region in view.find_all(kw, flags):
+                if region.begin() <= line_end:
+                    continue
+                line = view.line(region.begin())
+                found[line.begin()] = line
+                line_end = line.end()
+            if lines is None:
+                lines = found
+            else:
+                lines = {begin: line for begin, line in lines.items() if begin in found}
+            if not lines:
+                return []
+        return [lines[begin] for begin in sorted(lines)]
+
     def _search_open_files(self, file_paths, keywords):
         if not self.window:
             return []
+        view_by_path = view_cache.get_view_index(self.window)
         results = []
         for file_path in file_paths:
-            results.extend(self._search_file(file_path, keywords))
+            view = view_by_path.get(file_path)
+            if view and not view.is_valid():
+                view = None
+            results.extend(self._search_file(file_path, keywords, view))
         return results
 
     def _search_folders(self, folders, keywords):
         all_files = []
         for folder in folders:
             try:
-                for root, dirs, files in os.walk(folder):
-                    for fname in files:
-                        fpath = os.path.join(root, fname)
-                        if os.path.isfile(fpath) and self.file_filter.should_process(fpath):
-                            all_files.append(fpath)
+                all_files.extend(self.file_filter.iter_files(folder))
             except:
                 continue
+        lower_keywords = [kw.lower() for kw in keywords]
         results = []
-        for file_path in all_files:
-            try:
-                if os.path.getsize(file_path) > 10 * 1024 * 1024:
+        max_workers = min(32, multiprocessing.cpu_count() + 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for file_results in executor.map(lambda fp: self._scan_file(fp, lower_keywords), all_files):
+                results.extend(file_results)
+        return results
+
+    def _scan_file(self, file_path, lower_keywords):
+        results = []
+        try:
+            st = os.stat(file_path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size > 10 * 1024 * 1024:
+                return results
+            with open(file_path, 'rb') as f:
+                head = f.read(BINARY_SNIFF_SIZE)
+                if b'\x00' in head and not head.startswith(UTF16_BOMS):
+                    return results
+                raw_content = head + f.read(10 * 1024 * 1024 - len(head))
+            text = self._decode(raw_content)
+            if not text:
+                return results
+            lines = text.splitlines()
+            if not lines:
+                return results
+            if lower_keywords:
+                text_lower = text.lower()
+                if not self._line_matches(text_lower, lower_keywords):
+                    return results
+                lines_lower = text_lower.splitlines()
+            else:
+                lines_lower = lines
+            line_matches = self._line_matches
+            for line_num, (line, line_lower) in enumerate(islice(zip(lines, lines_lower), 10000), 1):
+                if not line_matches(line_lower, lower_keywords):
                     continue
-                lines = []
-                with open(file_path, 'rb') as f:
-                    raw_content = f.read(10 * 1024 * 1024)
-                for encoding in SUPPORTED_ENCODINGS:
-                    try:
-                        text = raw_content.decode(encoding)
-                        lines = text.splitlines()
-                        break
-                    except:
-                        continue
-                for line_num, line in enumerate(lines[:10000], 1):
-                    display_text = line.strip()
-                    if not display_text:
-                        continue
-                    if not self._line_matches(display_text, keywords):
-                        continue
-                    results.append({
-                        'file': file_path,
-                        'line_number': line_num,
-                        'line': line,
-                        'display': display_text,
-                        'point': line_num
-                    })
-            except:
-                continue
+                display_text = line.strip()
+                if not display_text:
+                    continue
+                results.append({
+                    'file': file_path,
+                    'line_number': line_num,
+                    'line': line,
+                    'display': display_text,
+                    'point': line_num
+                })
+        except:
+            pass
         return results
 
+    @staticmethod
+    def _decode(raw_content):
+        for bom, encoding in BOM_ENCODINGS:
+            if raw_content.startswith(bom):
+                try:
+                    return raw_content.decode(encoding)
+                except UnicodeDecodeError:
+                    break
+        for encoding in SUPPORTED_ENCODINGS:
+            try:
+                return raw_content.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        return None
+
     def _print_stats(self, results_count, paths, keywords, original, duration, files_with_results=None):
         scope_name = UIText.get_scope_display_name(self.scope)
-        print("🎯 {0} Search Complete".format(scope_name))
+        lines = ["🎯 {0} Search Complete".format(scope_name)]
         if keywords:
-            keyword_display = []
-            for i, kw in enumerate(keywords):
-                emoji = KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)]
-                keyword_display.append("{0}{1}".format(emoji, kw))
-            print("  📍 Keywords: {0}".format(" ".join(keyword_display)))
+            keyword_display = [
+                KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)] + kw for i, kw in enumerate(keywords)
+            ]
+            lines.append("  📍 Keywords: {0}".format(" ".join(keyword_display)))
         else:
-            print("  📍 Keywords: {0}".format(original or "All lines"))
+            lines.append("  📍 Keywords: {0}".format(original or "All lines"))
         if self.scope in ["folder", "project"]:
-            print("  📁 Folders: {0}".format(len(paths)))
+            lines.append("  📁 Folders: {0}".format(len(paths)))
             try:
                 filtered_count, approx = FileScanEstimator.count_filtered_files(
                     paths, self.settings, self.scope, self.window, timeout=0.8, max_files=200000
                 )
                 filtered_str = "~{}".format(filtered_count) if approx else str(filtered_count)
                 matched_str = str(files_with_results if files_with_results is not None else 0)
-                print("  📊 Files: {0} of {1} filtered".format(matched_str, filtered_str))
+                lines.append("  📊 Files: {0} of {1} filtered".format(matched_str, filtered_str))
             except Exception:
                 if files_with_results is not None:
-                    print("  📊 Files: {0}".format(files_with_results))
+                    lines.append("  📊 Files: {0}".format(files_with_results))
                 else:
-                    print("  📊 Files: N/A")
+                    lines.append("  📊 Files: N/A")
         elif self.scope == "file":
-            print("  📄 File: {0}".format(os.path.basename(paths[0]) if paths else "Unknown"))
+            lines.append("  📄 File: {0}".format(os.path.basename(paths[0]) if paths else "Unknown"))
         elif self.scope == "open_files":
             total_open = len(paths)
             if files_with_results is not None and files_with_results != total_open:
-                print("  📊 Files: {0} of {1} open".format(files_with_results, total_open))
+                lines.append("  📊 Files: {0} of {1} open".format(files_with_results, total_open))
             else:
-                print("  📊 Files: {0}".format(total_open))
-        print("  📝 Results: {0} lines".format(results_count))
-        print("  ⏱️ Time: {0:.3f}s".format(duration))
+                lines.append("  📊 Files: {0}".format(total_open))
+        lines.append("  📝 Results: {0} lines".format(results_count))
+        lines.append("  ⏱️ Time: {0:.3f}s".format(duration))
+        print("\n".join(lines))
 
 
 class Highlighter:
     def __init__(self):
         self.key_base = "QuickLineNavKeyword"
-        self.keys_by_view = defaultdict(set)
+        self.keys_by_view = {}
+        self.views = {}
         self.cache = {}
+        self.region_cache = {}
+        self.stamps = {}
+        self.stamp = 0
+        self.max_keys = 0
+
+    def next_stamp(self):
+        self.stamp += 1
+        return self.stamp
 
     def highlight(self, view, keywords):
         if not view or not view.is_valid():
@@ -729,58 +995,132 @@ class Highlighter:
             self.clear(view)
             return
         view_id = view.id()
-        cache_key = tuple(keywords)
+        cache_key = (tuple(kw.lower() for kw in keywords), view.change_count())
         if self.cache.get(view_id) == cache_key:
+            self.stamps[view_id] = self.next_stamp()
             return
         if view.is_loading() or view.size() == 0:
             sublime.set_timeout(lambda: self.highlight(view, keywords), 100)
             return
-        self.clear(view)
-        for i, keyword in enumerate(keywords):
-            if not keyword:
-                continue
+        cached = self.region_cache.get(view_id)
+        if cached and cached[0] == cache_key:
+            buckets = cached[1]
+        else:
             try:
-                regions = view.find_all(keyword, sublime.IGNORECASE | sublime.LITERAL)
-                if regions:
-                    key = "{key}_{index}".format(key=self.key_base, index=i)
-                    scope = HIGHLIGHT_SCOPES[i % len(HIGHLIGHT_SCOPES)]
-                    icon = HIGHLIGHT_ICONS[i % len(HIGHLIGHT_ICONS)]
-                    view.add_regions(
-                        key, regions, scope, icon, sublime.DRAW_NO_OUTLINE
-                    )
-                    self.keys_by_view[view_id].add(key)
+                buckets = self._find_keyword_regions(view, keywords)
             except Exception as e:
-                print("Error highlighting keyword '{}': {}".format(keyword, e))
+                print("Error highlighting keywords {}: {}".format(keywords, e))
+                self.clear(view)
+                return
+            self.region_cache[view_id] = (cache_key, buckets)
+        if len(buckets) > self.max_keys:
+            self.max_keys = len(buckets)
+        old_keys = self.keys_by_view.pop(view_id, set())
+        new_keys = set()
+        for i, regions in enumerate(buckets):
+            if not regions:
                 continue
-        if self.keys_by_view.get(view_id):
+            key = "{key}_{index}".format(key=self.key_base, index=i)
+            scope = HIGHLIGHT_SCOPES[i % len(HIGHLIGHT_SCOPES)]
+            icon = HIGHLIGHT_ICONS[i % len(HIGHLIGHT_ICONS)]
+            view.add_regions(
+                key, regions, scope, icon, sublime.DRAW_NO_OUTLINE
+            )
+            new_keys.add(key)
+        for key in old_keys - new_keys:
+            try:
+                view.erase_regions(key)
+            except:
+                pass
+        if new_keys:
+            self.keys_by_view[view_id] = new_keys
+            self.views[view_id] = view
             self.cache[view_id] = cache_key
+            self.stamps[view_id] = self.next_stamp()
+        else:
+            self.views.pop(view_id, None)
+            self.cache.pop(view_id, None)
+            self.stamps.pop(view_id, None)
+
+    def _find_keyword_regions(self, view, keywords):
+        lower_keywords = [kw.lower() for kw in keywords]
+        index_by_lower = {}
+        for i, kw_lower in enumerate(lower_keywords):
+            index_by_lower.setdefault(kw_lower, i)
+        alternatives = sorted(index_by_lower, key=len, reverse=True)
+        pattern = "|".join(re.escape(kw) for kw in alternatives)
+        buckets = [[] for _ in keywords]
+        for region in view.find_all(pattern, sublime.IGNORECASE):
+            text = view.substr(region).lower()
+            index = index_by_lower.get(text)
+            if index is None:
+                index = next((i for i, kw_lower in enumerate(lower_keywords) if kw_lower in text), None)
+                if index is None:
+                    continue
+            buckets[index].append(region)
+        return buckets
 
     def clear(self, view):
-        if not view or not view.is_valid():
+        if not view:
             return
         view_id = view.id()
-        for key in list(self.keys_by_view.get(view_id, [])):
-            try:
-                view.erase_regions(key)
-            except:
-                pass
+        keys = self.keys_by_view.pop(view_id, None)
+        self.views.pop(view_id, None)
+        self.cache.pop(view_id, None)
+        self.stamps.pop(view_id, None)
+        if not keys or not view.is_valid():
+            return
+        for key in keys:
+            view.erase_regions(key)
+
+    def forget(self, view_id):
         self.keys_by_view.pop(view_id, None)
+        self.views.pop(view_id, None)
         self.cache.pop(view_id, None)
+        self.stamps.pop(view_id, None)
+        self.region_cache.pop(view_id, None)
+
+    def has_highlights(self):
+        return bool(self.views)
 
     def clear_all(self):
-        for window in sublime.windows():
-            for v in window.views():
-                self.clear(v)
+        for view_id, view in list(self.views.items()):
+            if view.is_valid():
+                self.clear(view)
+            else:
+                self.forget(view_id)
+        self.keys_by_view.clear()
+        self.views.clear()
         self.cache.clear()
+        self.stamps.clear()
 
-    def sweep_view(self, view, max_keys=128):
+    def clear_stale(self, stamps):
+        for view_id, stamp in stamps.items():
+            if self.stamps.get(view_id) != stamp:
+                continue
+            view = self.views.get(view_id)
+            if view is not None and view.is_valid():
+                self.clear(view)
+            else:
+                self.forget(view_id)
+
+    def clear_window(self, window):
+        window_id = window.id()
+        for view_id, view in list(self.views.items()):
+            if not view.is_valid():
+                self.forget(view_id)
+                continue
+            view_window = view.window()
+            if view_window and view_window.id() == window_id:
+                self.clear(view)
+
+    def sweep_view(self, view, max_keys=None):
         if not view or not view.is_valid():
             return
+        if max_keys is None:
+            max_keys = self.max_keys
         for i in range(max_keys):
-            try:
-                view.erase_regions("{key}_{index}".format(key=self.key_base, index=i))
-            except:
-                pass
+            view.erase_regions("{key}_{index}".format(key=self.key_base, index=i))
 
 
 class DisplayFormatter:
@@ -794,121 +1134,140 @@ class DisplayFormatter:
         '＋', '＝', '＊', '＆', '％', '＄', '＃', '＠',
         '　'
     }
+    _instance = None
+
+    @classmethod
+    def shared(cls):
+        formatter = cls._instance
+        if formatter is None:
+            formatter = cls(settings)
+            cls._instance = formatter
+        return formatter
+
+    @classmethod
+    def clear_instance(cls):
+        cls._instance = None
 
     def __init__(self, settings):
         self.settings = settings
         self.show_line_numbers = settings.get("show_line_numbers", True)
         self.max_length = settings.get("max_display_length", 120)
-        self._width_cache = {}
-        self._emoji_cache = {}
         self._format_cache = {}
-        self._segment_cache = {}
-        self._keyword_patterns = {}
+        self._file_label_cache = {}
         self.total_to_format = 0
         self.current_formatted = 0
-        self._char_width_cache = {}
-        self._last_keywords_key = None
-
-    def _char_width(self, ch):
-        cw = self._char_width_cache.get(ch)
-        if cw is not None:
-            return cw
-        w = TextUtils.display_width(ch)
-        if len(self._char_width_cache) < 10000:
-            self._char_width_cache[ch] = w
-        return w
+        self._keyword_state = (None, None)
+
+    def _width_prefix_sums(self, text):
+        if NON_ASCII_PATTERN.search(text) is None:
+            return list(range(len(text) + 1))
+        width_ps = [0]
+        width_ps.extend(accumulate(TextUtils.char_widths(text)))
+        return width_ps
 
     def _prepare_line_metrics(self, text, keyword_info):
-        width_ps = [0] * (len(text) + 1)
-        for i, ch in enumerate(text):
-            width_ps[i+1] = width_ps[i] + self._char_width(ch)
-
-        lower = text.lower()
-        match_pos_map = {}
-        total_matches = 0
-        for kw, kw_lower in zip(keyword_info['keywords'], keyword_info['lower_keywords']):
-            pos_list = []
-            start = 0
-            step = max(1, len(kw_lower))
-            while True:
-                idx = lower.find(kw_lower, start)
-                if idx == -1:
-                    break
-                pos_list.append(idx)
-                start = idx + step
-            match_pos_map[kw_lower] = pos_list
-            total_matches += len(pos_list)
+        match_starts = []
+        match_ends = []
+        match_replacements = []
+        pattern, groups = keyword_info['matcher']
+        if pattern is not None:
+            for match in pattern.finditer(text):
+                match_starts.append(match.start())
+                match_ends.append(match.end())
+                match_replacements.append(groups[match.lastindex - 1][1])
 
         return {
-            'width_ps': width_ps,
-            'lower': lower,
-            'match_pos_map': match_pos_map,
-            'total_matches': total_matches
+            'width_ps': None,
+            'match_starts': match_starts,
+            'match_ends': match_ends,
+            'match_replacements': match_replacements,
+            'total_matches': len(match_starts)
         }
 
+    def _insert_emojis(self, text, metrics, start, end):
+        match_starts = metrics['match_starts']
+        if not match_starts:
+            return text[start:end]
+        match_ends = metrics['match_ends']
+        replacements = metrics['match_replacements']
+        parts = []
+        prev = start
+        for i in range(bisect.bisect_left(match_starts, start), len(match_starts)):
+            if match_ends[i] > end:
+                break
+            parts.append(text[prev:match_starts[i]])
+            parts.append(replacements[i])
+            prev = match_ends[i]
+        parts.append(text[prev:end])
+        return "".join(parts)
+
     def _span_width(self, width_ps, start, end):
         return width_ps[end] - width_ps[start]
 
-    def _count_overhead(self, match_pos_map, lower_keywords, start, end, kw_lens):
-        import bisect
-        extra = 0
-        for kw_lower, kw_len in zip(lower_keywords, kw_lens):
-            pos_list = match_pos_map.get(kw_lower, [])
-            if not pos_list:
-                continue
-            right_bound = max(start, end - kw_len)
-            lo = bisect.bisect_left(pos_list, start)
-            hi = bisect.bisect_right(pos_list, right_bound)
-            extra += (hi - lo) * 2
-        return extra
+    def _count_overhead(self, metrics, start, end):
+        match_starts = metrics['match_starts']
+        if not match_starts:
+            return 0
+        lo = bisect.bisect_left(match_starts, start)
+        hi = bisect.bisect_right(metrics['match_ends'], end)
+        return max(0, hi - lo) * 2
+
+    def _avoid_split_match(self, metrics, start, end):
+        match_starts = metrics['match_starts']
+        i = bisect.bisect_left(match_starts, end) - 1
+        if i >= 0 and match_starts[i] > start and metrics['match_ends'][i] > end:
+            return match_starts[i]
+        return end
+
+    def _find_segment_end(self, metrics, start, text_len):
+        width_ps = metrics['width_ps']
+        width_end = bisect.bisect_right(width_ps, width_ps[start] + self.max_length) - 1
+        width_end = max(start + 1, min(width_end, text_len))
+        if not metrics['match_starts']:
+            return width_end
+        left = start + 1
+        right = width_end
+        best_end = start + 1
+        while left <= right:
+            mid = (left + right) // 2
+            total_w = self._span_width(width_ps, start, mid) + self._count_overhead(metrics, start, mid)
+            if total_w <= self.max_length:
+                best_end = mid
+                left = mid + 1
+            else:
+                right = mid - 1
+        return best_end
 
-    def format_results(self, results, keywords, scope):
-        if not results:
-            return [], []
-        if len(self._format_cache) > 5000:
+    def prepare_keywords(self, keywords):
+        if len(self._format_cache) >= 5000 or len(self._file_label_cache) >= 5000:
             self.clear_caches()
         kw_key = tuple(keywords) if keywords else ()
-        if kw_key != self._last_keywords_key:
-            self._prepare_keyword_patterns(keywords)
-            self._last_keywords_key = kw_key
-        keyword_info = self._prepare_keyword_info_cached(keywords)
-        formatted = []
-        expanded_results = []
-        display_index = 0
-        for i, item in enumerate(results):
-            cache_key = (
-                item.get('file', ''),
-                item.get('line_number', -1),
-                hash(item['line'][:50]) if len(item['line']) > 50 else item['line']
-            )
-            if cache_key in self._format_cache:
-                cached = self._format_cache[cache_key]
-                updated_formatted = []
-                updated_expanded = []
-                for j, (fmt_item, exp_item) in enumerate(zip(cached['formatted'], cached['expanded'])):
-                    current_display_index = display_index + j
-                    updated_sub_line = self._format_sub_line_simple(
-                        exp_item, current_display_index, keyword_info, scope,
-                        exp_item.get('segment_index', 0),
-                        exp_item.get('total_segments', 1)
-                    )
-                    updated_formatted.append([fmt_item[0], updated_sub_line])
-                    updated_expanded.append(exp_item)
-                display_index += len(cached['formatted'])
-                formatted.extend(updated_formatted)
-                expanded_results.extend(updated_expanded)
-                continue
-            fmt_items, exp_items = self._format_single_fast(item, display_index, keyword_info, scope)
-            display_index += len(fmt_items)
-            if len(self._format_cache) < 5000:
-                original_formatted = [[fi[0], fi[1]] for fi in fmt_items]
-                self._format_cache[cache_key] = {
-                    'formatted': original_formatted,
-                    'expanded': exp_items
-                }
-            formatted.extend(fmt_items)
-            expanded_results.extend(exp_items)
-        return formatted, expanded_results
+        last_key, keyword_info = self._keyword_state
+        if kw_key != last_key:
+            keyword_info = self._prepare_keyword_info(kw_key)
+            keyword_info['matcher'] = self._prepare_keyword_patterns(keyword_info)
+            self._keyword_state = (kw_key, keyword_info)
+        return keyword_info
+
+    def format_item(self, item, keyword_info, scope):
+        cache_key = (
+            scope,
+            keyword_info['keywords'],
+            item.get('file', ''),
+            item.get('line_number', -1),
+            item.get('point'),
+            item['line']
+        )
+        cached = self._format_cache.get(cache_key)
+        if cached is not None:
+            return [[fmt_item[0], fmt_item[1]] for fmt_item in cached['formatted']], cached['expanded']
+        fmt_items, exp_items = self._format_single_fast(item, 0, keyword_info, scope)
+        if len(self._format_cache) < 5000:
+            self._format_cache[cache_key] = {
+                'formatted': [[fi[0], fi[1]] for fi in fmt_items],
+                'expanded': exp_items
+            }
+        return fmt_items, exp_items
 
     def _format_single_fast(self, item, start_display_index, keyword_info, scope):
         line = item['line']
@@ -918,89 +1277,44 @@ class DisplayFormatter:
             return [], []
 
         metrics = self._prepare_line_metrics(line_stripped, keyword_info)
-        kw_lens = [len(kw) for kw in keyword_info['lower_keywords']]
-
-        base_width = self._span_width(metrics['width_ps'], 0, len(line_stripped))
-        est_extra = self._count_overhead(metrics['match_pos_map'], keyword_info['lower_keywords'], 0, len(line_stripped), kw_lens)
-        est_total = base_width + est_extra
 
         formatted_items = []
         expanded_items = []
+        base_item = {
+            'file': item.get('file'),
+            'line_number': item.get('line_number'),
+            'line': item.get('line'),
+            'display': item.get('display'),
+            'point': item.get('point'),
+            'strip_offset': strip_offset
+        }
 
-        if est_total <= self.max_length:
-            line_with_emojis = self._apply_emoji_highlights_fast(line_stripped, keyword_info)
+        if self._fits_on_one_row(line_stripped, metrics):
+            line_with_emojis = self._insert_emojis(line_stripped, metrics, 0, len(line_stripped))
             sub_line = self._format_sub_line_simple(item, start_display_index, keyword_info, scope)
             formatted_items.append([line_with_emojis, sub_line])
-            expanded_item = {
-                'file': item.get('file'),
-                'line_number': item.get('line_number'),
-                'line': item.get('line'),
-                'display': item.get('display'),
-                'point': item.get('point'),
-                'strip_offset': strip_offset,
-                'is_single_segment': True
-            }
-            expanded_items.append(expanded_item)
+            base_item['is_single_segment'] = True
+            expanded_items.append(base_item)
             return formatted_items, expanded_items
 
-        segments = []
-        start = 0
-        text_len = len(line_stripped)
-        while start < text_len:
-            left = start + 1
-            right = text_len
-            best_end = start + 1
-            while left <= right:
-                mid = (left + right) // 2
-                seg_width = self._span_width(metrics['width_ps'], start, mid)
-                seg_extra = self._count_overhead(metrics['match_pos_map'], keyword_info['lower_keywords'], start, mid, kw_lens)
-                total_w = seg_width + seg_extra
-                if total_w <= self.max_length:
-                    best_end = mid
-                    left = mid + 1
-                else:
-                    right = mid - 1
-
-            if best_end >= text_len:
-                segments.append((start, text_len))
-                break
-
-            actual_end = self._find_best_break_forward(line_stripped, start, best_end, keyword_info)
-            if actual_end > best_end:
-                seg_width = self._span_width(metrics['width_ps'], start, actual_end)
-                seg_extra = self._count_overhead(metrics['match_pos_map'], keyword_info['lower_keywords'], start, actual_end, kw_lens)
-                if seg_width + seg_extra > self.max_length:
-                    actual_end = self._find_best_break_backward(line_stripped, start, best_end)
-
-            if actual_end <= start:
-                actual_end = min(start + 1, text_len)
-
-            segments.append((start, actual_end))
-            start = actual_end
+        segments = self._split_segments(line_stripped, metrics, keyword_info)
+        total_segments = len(segments)
 
         for seg_index, (seg_start, seg_end) in enumerate(segments):
-            seg_text = line_stripped[seg_start:seg_end]
-            seg_with_emojis = self._apply_emoji_highlights_fast(seg_text, keyword_info)
+            seg_with_emojis = self._insert_emojis(line_stripped, metrics, seg_start, seg_end)
             current_display_index = start_display_index + seg_index
             sub_line = self._format_sub_line_simple(
-                item, current_display_index, keyword_info, scope, seg_index, len(segments)
+                item, current_display_index, keyword_info, scope, seg_index, total_segments
             )
             formatted_items.append([seg_with_emojis, sub_line])
-
-            expanded_item = {
-                'file': item.get('file'),
-                'line_number': item.get('line_number'),
-                'line': item.get('line'),
-                'display': item.get('display'),
-                'point': item.get('point'),
-                'segment_start': seg_start,
-                'segment_end': seg_end,
-                'segment_index': seg_index,
-                'total_segments': len(segments),
-                'strip_offset': strip_offset,
-                'is_single_segment': False
-            }
-            expanded_items.append(expanded_item)
+            expanded_items.append(dict(
+                base_item,
+                segment_start=seg_start,
+                segment_end=seg_end,
+                segment_index=seg_index,
+                total_segments=total_segments,
+                is_single_segment=False
+            ))
 
         return formatted_items, expanded_items
 
@@ -1012,101 +1326,76 @@ class DisplayFormatter:
         if total_segments > 1:
             parts.append("📍 {}/{}".format(segment_index + 1, total_segments))
         if 'file' in item and scope != 'file':
-            filename = os.path.basename(item['file'])
+            parts.append(self._file_label(item['file']))
+        return "☲ " + " ".join(parts)
+
+    def _file_label(self, file_path):
+        label = self._file_label_cache.get(file_path)
+        if label is None:
+            filename = os.path.basename(file_path)
             if len(filename) > 50:
                 filename = filename[:47] + "..."
-            parts.append("📄 {}".format(filename))
-        return "☲ " + " ".join(parts)
+            label = "📄 {}".format(filename)
+            if len(self._file_label_cache) < 5000:
+                self._file_label_cache[file_path] = label
+        return label
+
+    def _prepare_keyword_patterns(self, keyword_info):
+        groups = []
+        seen = set()
+        for kw, kw_lower, emoji in zip(keyword_info['keywords'], keyword_info['lower_keywords'], keyword_info['emojis']):
+            if kw and kw_lower not in seen:
+                seen.add(kw_lower)
+                groups.append((kw_lower, emoji + kw, kw))
+        groups.sort(key=lambda group: len(group[2]), reverse=True)
+        if groups:
+            pattern = re.compile("|".join("(" + re.escape(group[2]) + ")" for group in groups), re.IGNORECASE)
+        else:
+            pattern = None
+        return pattern, groups
 
-    def _prepare_keyword_patterns(self, keywords):
-        kw_key = tuple(keywords) if keywords else ()
-        if getattr(self, '_patterns_key', None) == kw_key:
-            return
-        self._keyword_patterns.clear()
-        for kw in keywords or []:
-            if kw and kw not in self._keyword_patterns:
-                self._keyword_patterns[kw] = re.compile(re.escape(kw), re.IGNORECASE)
-        self._patterns_key = kw_key
-
-    def _prepare_keyword_info_cached(self, keywords):
-        if not hasattr(self, '_last_keyword_info') or (tuple(keywords) != getattr(self, '_last_keyword_info_key', None)):
-            info = {
-                'keywords': keywords,
-                'lower_keywords': [kw.lower() for kw in keywords],
-                'emoji_map': {}
-            }
-            for i, kw in enumerate(keywords):
-                emoji = KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)]
-                info['emoji_map'][kw.lower()] = emoji
-                self._emoji_cache[kw.lower()] = emoji
-            self._last_keyword_info = info
-            self._last_keyword_info_key = tuple(keywords)
-        return self._last_keyword_info
-
-    def _apply_emoji_highlights_fast(self, text, keyword_info):
-        if not keyword_info['keywords']:
-            return text
-        result = text
-        for i, kw in enumerate(keyword_info['keywords']):
-            emoji = KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)]
-            pattern = self._keyword_patterns.get(kw)
-            if pattern:
-                result = pattern.sub(emoji + kw, result)
-        return result
+    def _prepare_keyword_info(self, keywords):
+        lower_keywords = tuple(kw.lower() for kw in keywords)
+        emojis = tuple(KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)] for i in range(len(keywords)))
+        return {
+            'keywords': keywords,
+            'lower_keywords': lower_keywords,
+            'emojis': emojis
+        }
 
-    def _smart_split_original(self, text, keyword_info):
-        if not text:
-            return []
-        emoji_overhead_per_char = 0
-        if keyword_info['keywords']:
-            total_keyword_length = 0
-            total_keyword_count = 0
-            for kw in keyword_info['keywords']:
-                count = len(re.findall(re.escape(kw), text, re.IGNORECASE))
-                total_keyword_count += count
-                total_keyword_length += count * len(kw)
-            if total_keyword_length > 0:
-                emoji_overhead_per_char = (total_keyword_count * 2) / len(text)
-        text_width = self._get_cached_width(text)
-        estimated_total_width = text_width + (total_keyword_count * 2 if keyword_info['keywords'] else 0)
-        if estimated_total_width <= self.max_length:
-            return [(0, len(text))]
+    def _fits_on_one_row(self, text, metrics):
+        budget = self.max_length - metrics['total_matches'] * 2
+        text_len = len(text)
+        if text_len > budget:
+            return False
+        if text_len * 2 <= budget:
+            return True
+        return TextUtils.display_width(text) <= budget
+
+    def _split_segments(self, text, metrics, keyword_info):
+        if metrics['width_ps'] is None:
+            metrics['width_ps'] = self._width_prefix_sums(text)
         segments = []
         start = 0
         text_len = len(text)
         while start < text_len:
-            left = start + 1
-            right = text_len
-            best_end = start + 1
-            while left <= right:
-                mid = (left + right) // 2
-                segment_text = text[start:mid]
-                segment_width = self._get_cached_width(segment_text)
-                segment_emoji_overhead = 0
-                for kw in keyword_info['keywords']:
-                    count = len(re.findall(re.escape(kw), segment_text, re.IGNORECASE))
-                    segment_emoji_overhead += count * 2
-                total_width = segment_width + segment_emoji_overhead
-                if total_width <= self.max_length:
-                    best_end = mid
-                    left = mid + 1
-                else:
-                    right = mid - 1
+            best_end = self._find_segment_end(metrics, start, text_len)
+
             if best_end >= text_len:
                 segments.append((start, text_len))
                 break
+
             actual_end = self._find_best_break_forward(text, start, best_end, keyword_info)
             if actual_end > best_end:
-                test_segment = text[start:actual_end]
-                test_width = self._get_cached_width(test_segment)
-                test_emoji_overhead = 0
-                for kw in keyword_info['keywords']:
-                    count = len(re.findall(re.escape(kw), test_segment, re.IGNORECASE))
-                    test_emoji_overhead += count * 2
-                if test_width + test_emoji_overhead > self.max_length:
+                seg_width = self._span_width(metrics['width_ps'], start, actual_end)
+                seg_extra = self._count_overhead(metrics, start, actual_end)
+                if seg_width + seg_extra > self.max_length:
                     actual_end = self._find_best_break_backward(text, start, best_end)
+
+            actual_end = self._avoid_split_match(metrics, start, actual_end)
             if actual_end <= start:
                 actual_end = min(start + 1, text_len)
+
             segments.append((start, actual_end))
             start = actual_end
         return segments
@@ -1166,14 +1455,6 @@ class DisplayFormatter:
         next_char = text[pos + 1]
         return prev_char.isalnum() and next_char.isalnum()
 
-    def _get_cached_width(self, text):
-        if text in self._width_cache:
-            return self._width_cache[text]
-        width = TextUtils.display_width(text)
-        if len(self._width_cache) < 5000:
-            self._width_cache[text] = width
-        return width
-
     def _is_emoji(self, char):
         return char in KEYWORD_EMOJIS
 
@@ -1188,11 +1469,9 @@ class DisplayFormatter:
         )
 
     def clear_caches(self):
-        self._width_cache.clear()
-        self._emoji_cache.clear()
         self._format_cache.clear()
-        self._segment_cache.clear()
-        self._keyword_patterns.clear()
+        self._file_label_cache.clear()
+        self._keyword_state = (None, None)
 
 
 
@@ -1201,8 +1480,10 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         super().__init__(window)
         self.current_segment_key = None
         self.highlighted_view_id = None
+        self.highlighted_view = None
+        self._last_highlighted_line = None
         self.input_view = None
-        self.settings = Settings()
+        self.settings = settings
         self.original_keywords = ""
         self.scope = None
         self._border_timer_id = 0
@@ -1239,9 +1520,9 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         return ""
 
     def setup_input_panel(self, initial_text):
-        keyword_state_manager.debug_print("setup_input_panel(): scope='{0}', initial_text='{1}'".format(
+        keyword_state_manager.debug_print("setup_input_panel(): scope='{0}', initial_text='{1}'",
             self.scope, initial_text
-        ))
+        )
         self.input_view = self.window.show_input_panel(
             UIText.get_search_prompt(self.scope),
             initial_text,
@@ -1259,7 +1540,7 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
             self.input_view.sel().clear()
             end_point = self.input_view.size()
             self.input_view.sel().add(sublime.Region(end_point, end_point))
-            keyword_state_manager.debug_print("Cursor moved to end position {0}".format(end_point))
+            keyword_state_manager.debug_print("Cursor moved to end position {0}", end_point)
 
     def update_input_panel_prompt(self):
         if self.input_view and self.input_view.is_valid():
@@ -1301,9 +1582,9 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         keyword_state_manager.debug_print("Focus set to input panel")
 
     def on_cancel(self):
-        keyword_state_manager.debug_print("on_cancel(): Called, is_panel_switching={0}".format(
+        keyword_state_manager.debug_print("on_cancel(): Called, is_panel_switching={0}",
             keyword_state_manager.is_panel_switching
-        ))
+        )
         if keyword_state_manager.is_panel_switching:
             keyword_state_manager.debug_print("Panel switching detected, not clearing keywords")
             self.clear_highlights()
@@ -1316,7 +1597,7 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         self.clear_highlights()
 
     def on_change(self, input_text):
-        keyword_state_manager.debug_print("on_change(): input_text='{0}'".format(input_text))
+        keyword_state_manager.debug_print("on_change(): input_text='{0}'", input_text)
         keyword_state_manager.save_current_keywords(input_text)
         if self.settings.get("preview_on_highlight", True):
             if not input_text or not input_text.strip():
@@ -1337,9 +1618,9 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
     def run_with_input_handling(self):
         selected_text = self.get_selected_text()
         current_command_id = self.get_command_id()
-        keyword_state_manager.debug_print("run_with_input_handling(): command={0}, scope='{1}', selected_text='{2}'".format(
+        keyword_state_manager.debug_print("run_with_input_handling(): command={0}, scope='{1}', selected_text='{2}'",
             current_command_id, self.scope, selected_text
-        ))
+        )
         keyword_state_manager.reset_panel_flags()
 
         if keyword_state_manager.has_active_panel():
@@ -1349,9 +1630,9 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
             active_input_view = active_panel.get('input_view')
             is_same_command = (active_command_id == current_command_id and active_scope == self.scope)
 
-            keyword_state_manager.debug_print("Active panel found - active_command={0}, active_scope={1}, is_same={2}".format(
+            keyword_state_manager.debug_print("Active panel found - active_command={0}, active_scope={1}, is_same={2}",
                 active_command_id, active_scope, is_same_command
-            ))
+            )
 
             if is_same_command and active_input_view and active_input_view.is_valid():
                 if selected_text:
@@ -1367,7 +1648,7 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
                 current_text = keyword_state_manager.get_active_panel_text()
                 if current_text:
                     keyword_state_manager.stored_keywords = current_text
-                    keyword_state_manager.debug_print("Saved current panel text for switching: '{0}'".format(current_text))
+                    keyword_state_manager.debug_print("Saved current panel text for switching: '{0}'", current_text)
 
                 keyword_state_manager.is_panel_switching = True
                 keyword_state_manager.debug_print("Marking panel switch: True")
@@ -1378,17 +1659,17 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
                     )
                     keyword_state_manager.stored_keywords = updated_stored
                     initial_text = self._ensure_trailing_space(updated_stored)
-                    keyword_state_manager.debug_print("Cross-scope switching with selection append: '{0}'".format(initial_text))
+                    keyword_state_manager.debug_print("Cross-scope switching with selection append: '{0}'", initial_text)
                 else:
                     initial_text = self.get_initial_text()
-                    keyword_state_manager.debug_print("Cross-scope switching without selection: '{0}'".format(initial_text))
+                    keyword_state_manager.debug_print("Cross-scope switching without selection: '{0}'", initial_text)
 
                 self.setup_input_panel(initial_text)
                 sublime.set_timeout(lambda: setattr(keyword_state_manager, 'is_panel_switching', False), 100)
                 return
 
         initial_text = self.get_initial_text()
-        keyword_state_manager.debug_print("Creating new panel with initial_text: '{0}'".format(initial_text))
+        keyword_state_manager.debug_print("Creating new panel with initial_text: '{0}'", initial_text)
         self.setup_input_panel(initial_text)
 
     def _ensure_trailing_space(self, text):
@@ -1399,8 +1680,7 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
             return text + ' '
         return text
 
-    def process_search_done(self, input_text, results):
-        keywords = TextUtils.parse_keywords(input_text) if input_text else []
+    def process_search_done(self, input_text, results, keywords):
         keyword_state_manager.save_current_keywords(input_text)
         keyword_state_manager.clear_active_panel()
         if not results:
@@ -1408,11 +1688,8 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
             self.setup_input_panel(input_text)
             return False
         if keywords:
-            formatted_keywords = []
-            for kw in keywords:
-                formatted_keywords.append(TextUtils.format_keyword_for_input(kw))
-            keywords_text = ' '.join(formatted_keywords)
-            sublime.set_clipboard(keywords_text)
+            format_keyword = TextUtils.format_keyword_for_input
+            sublime.set_clipboard(' '.join([format_keyword(kw) for kw in keywords]))
         return True
 
     def _show_results(self, results, keywords):
@@ -1460,6 +1737,8 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         key = "QuickLineNavSegment_{0}".format(view.id())
         self.current_segment_key = key
         self.highlighted_view_id = view.id()
+        self.highlighted_view = view
+        segment_highlight_views[view.id()] = highlighter.next_stamp()
         if not is_single_segment and show_border:
             total_segments = item.get('total_segments', 1)
             if total_segments > 1:
@@ -1498,8 +1777,6 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
         current_file = item.get('file', '')
         current_line_number = item.get('line_number', -1)
         new_line_key = (current_file, current_line_number)
-        if not hasattr(self, '_last_highlighted_line'):
-            self._last_highlighted_line = None
         is_new_line = self._last_highlighted_line != new_line_key
         if self.current_segment_key and self.highlighted_view_id:
             self._clear_previous_highlights(is_new_line)
@@ -1510,20 +1787,19 @@ class BaseSearchCommand(sublime_plugin.WindowCommand):
     def _clear_previous_highlights(self, clear_border=False):
         if not self.highlighted_view_id:
             return
-        for window in sublime.windows():
-            for v in window.views():
-                if v.id() == self.highlighted_view_id:
-                    if self.current_segment_key:
-                        try:
-                            v.erase_regions(self.current_segment_key)
-                        except:
-                            pass
-                        if clear_border:
-                            try:
-                                v.erase_regions(self.current_segment_key + "_border")
-                            except:
-                                pass
-                    break
+        v = self.highlighted_view
+        if not v or not v.is_valid() or v.id() != self.highlighted_view_id:
+            return
+        if self.current_segment_key:
+            try:
+                v.erase_regions(self.current_segment_key)
+            except:
+                pass
+            if clear_border:
+                try:
+                    v.erase_regions(self.current_segment_key + "_border")
+                except:
+                    pass
 
     def handle_quick_panel_cancel(self, formatted_keywords):
         keyword_state_manager.save_current_keywords(formatted_keywords)
@@ -1595,13 +1871,12 @@ class ResultsDisplayHandler:
 
         def format_batch(batch_items, formatter):
             batch_results = []
+            keyword_info = formatter.prepare_keywords(keywords)
             for index, result in batch_items:
                 if progress_data['cancelled']:
                     break
                 try:
-                    formatted, expanded = formatter.format_results(
-                        [result], keywords, scope
-                    )
+                    formatted, expanded = formatter.format_item(result, keyword_info, scope)
                     batch_results.append((index, formatted, expanded))
                 except Exception as e:
                     print("Format error for item {}: {}".format(index, e))
@@ -1623,7 +1898,7 @@ class ResultsDisplayHandler:
                     print("Worker {} error: {}".format(worker_id, e))
 
         def format_all_results():
-            formatter = DisplayFormatter(Settings())
+            formatter = DisplayFormatter.shared()
             update_progress(0, force=True)
             if total_results < 50:
                 batch_size = 10
@@ -1699,13 +1974,14 @@ class ResultsDisplayHandler:
                     row[1] = row[1].replace("{QLN_N}", str(idx))
                 except Exception:
                     pass
+            input_keywords = [TextUtils.format_keyword_for_input(kw) for kw in keywords or []]
             placeholder_text = ResultsDisplayHandler._get_placeholder_text(
-                keywords,
+                input_keywords,
                 total_results,
                 scope,
                 command_instance._get_context_info() if hasattr(command_instance, '_get_context_info') else None
             )
-            formatted_keywords = ResultsDisplayHandler._format_keywords(keywords)
+            formatted_keywords = ' '.join(input_keywords)
             def show_panel():
                 sublime.status_message("Formatting complete - {} lines".format(len(all_items)))
                 ResultsDisplayHandler._preload_files(window, all_expanded[:20])
@@ -1772,13 +2048,7 @@ class ResultsDisplayHandler:
                 window.open_file(file_path, sublime.TRANSIENT | sublime.FORCE_GROUP)
 
     @staticmethod
-    def _format_keywords(keywords):
-        if not keywords:
-            return ""
-        return ' '.join(TextUtils.format_keyword_for_input(kw) for kw in keywords)
-
-    @staticmethod
-    def _get_placeholder_text(keywords, results_count, scope=None, context_info=None):
+    def _get_placeholder_text(input_keywords, results_count, scope=None, context_info=None):
         scope_prefix = ""
         if scope == "file" and context_info:
             filename = os.path.basename(context_info)
@@ -1829,18 +2099,14 @@ class ResultsDisplayHandler:
                 scope_prefix = "Open files"
         else:
             scope_prefix = UIText.get_scope_display_name(scope) if scope else "Search"
-        if not keywords:
+        if not input_keywords:
             return "{}: All lines - {} lines found".format(scope_prefix, results_count)
-        display_keywords = keywords[:5]
         placeholder_keywords = [
-            '{}{}'.format(
-                KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)],
-                TextUtils.format_keyword_for_input(kw)
-            )
-            for i, kw in enumerate(display_keywords)
+            '{}{}'.format(KEYWORD_EMOJIS[i % len(KEYWORD_EMOJIS)], kw)
+            for i, kw in enumerate(input_keywords[:5])
         ]
-        if len(keywords) > 5:
-            placeholder_keywords.append("... +{} more".format(len(keywords) - 5))
+        if len(input_keywords) > 5:
+            placeholder_keywords.append("... +{} more".format(len(input_keywords) - 5))
         return "{}: {} - {} lines found".format(
             scope_prefix,
             ' '.join(placeholder_keywords),
@@ -1861,6 +2127,13 @@ class ResultsDisplayHandler:
                 seg_rel = 0
         return max(0, strip_offset + seg_rel)
 
+    @staticmethod
+    def _find_open_view(window, file_path):
+        view = view_cache.get_view_index(window).get(file_path)
+        if view is not None and view.is_valid() and view.file_name() == file_path:
+            return view
+        return None
+
     @staticmethod
     def _handle_selection(window, item, keywords, scope, highlight_segment_callback):
         file_path = item['file']
@@ -1871,11 +2144,7 @@ class ResultsDisplayHandler:
         keyword_state_manager.debug_print("_handle_selection(): Search completed, clearing stored keywords")
 
         if scope == 'open_files':
-            target_view = None
-            for view in window.views():
-                if view.file_name() == file_path:
-                    target_view = view
-                    break
+            target_view = ResultsDisplayHandler._find_open_view(window, file_path)
             if target_view:
                 window.focus_view(target_view)
                 point = target_view.text_point(line_number, seg_col)
@@ -1910,23 +2179,7 @@ class ResultsDisplayHandler:
         line_number = item.get('line_number', 1) - 1
         seg_col = ResultsDisplayHandler._compute_segment_col(item)
 
-        if scope == 'open_files':
-            for view in window.views():
-                if view.file_name() == file_path:
-                    window.focus_view(view)
-                    point = view.text_point(line_number, seg_col)
-                    view.sel().clear()
-                    view.sel().add(sublime.Region(point))
-                    view.show_at_center(point)
-                    highlighter.highlight(view, keywords)
-                    highlight_segment_callback(view, item, line_number)
-                    return
-
-        target_view = None
-        for view in window.views():
-            if view.file_name() == file_path:
-                target_view = view
-                break
+        target_view = ResultsDisplayHandler._find_open_view(window, file_path)
         if target_view:
             window.focus_view(target_view)
             point = target_view.text_point(line_number, seg_col)
@@ -1956,6 +2209,21 @@ class ViewCache:
     def __init__(self):
         self._cache = {}
         self._max_size = 50
+        self._index_by_window = {}
+
+    def get_view_index(self, window):
+        index = self._index_by_window.get(window.id())
+        if index is None:
+            index = {}
+            for view in window.views():
+                file_name = view.file_name()
+                if file_name and file_name not in index:
+                    index[file_name] = view
+            self._index_by_window[window.id()] = index
+        return index
+
+    def invalidate_index(self):
+        self._index_by_window.clear()
 
     def get_view_for_file(self, window, file_path):
         if file_path in self._cache:
@@ -1980,6 +2248,7 @@ class ViewCache:
 
     def clear(self):
         self._cache.clear()
+        self._index_by_window.clear()
 
 
 class UIText:
@@ -1990,31 +2259,41 @@ class UIText:
         'open_files': 'open files',
         'current_file': 'current file'
     }
+    STATUS_MESSAGES = {
+        'no_folder': "No folder open",
+        'no_project': "No project open",
+        'no_file': "No file open",
+        'no_open_files': "No files open",
+        'no_results': "No results found",
+        'no_results_in_scope': "No results found in {scope}",
+        'filter_enabled': "Extension filters {status} ({mode})",
+        'search_folder_set': "Search folder set to: {path}",
+        'search_folder_cleared': "Search folder cleared"
+    }
+
+    _prompt_cache = {}
+    _display_name_cache = {}
 
     @classmethod
     def get_search_prompt(cls, scope):
-        scope_text = cls.SCOPE_NAMES.get(scope, scope)
-        return 'Pre-precision search in {0} with space-separated keywords or "key phrases":'.format(scope_text)
+        prompt = cls._prompt_cache.get(scope)
+        if prompt is None:
+            scope_text = cls.SCOPE_NAMES.get(scope, scope)
+            prompt = 'Pre-precision search in {0} with space-separated keywords or "key phrases":'.format(scope_text)
+            cls._prompt_cache[scope] = prompt
+        return prompt
 
     @classmethod
     def get_status_message(cls, message_type, **kwargs):
-        messages = {
-            'no_folder': "No folder open",
-            'no_project': "No project open",
-            'no_file': "No file open",
-            'no_open_files': "No files open",
-            'no_results': "No results found",
-            'no_results_in_scope': "No results found in {scope}",
-            'filter_enabled': "Extension filters {status} ({mode})",
-            'search_folder_set': "Search folder set to: {path}",
-            'search_folder_cleared': "Search folder cleared"
-        }
-        template = messages.get(message_type, message_type)
-        return template.format(**kwargs)
+        template = cls.STATUS_MESSAGES.get(message_type, message_type)
+        return template.format(**kwargs) if kwargs else template
 
     @classmethod
     def get_scope_display_name(cls, scope):
-        return cls.SCOPE_NAMES.get(scope, scope).title()
+        name = cls._display_name_cache.get(scope)
+        if name is None:
+            name = cls._display_name_cache[scope] = cls.SCOPE_NAMES.get(scope, scope).title()
+        return name
 
 
 class QlnCommand(BaseSearchCommand):
@@ -2031,7 +2310,6 @@ class QlnCommand(BaseSearchCommand):
             self.file_path = view.file_name()
         elif scope in ["folder", "project"]:
             if scope == "folder":
-                settings = Settings()
                 custom_folder = settings.get("search_folder_path", "")
                 if custom_folder and os.path.exists(custom_folder):
                     self.folders = [custom_folder]
@@ -2046,7 +2324,8 @@ class QlnCommand(BaseSearchCommand):
 
     def on_done(self, input_text):
         self.original_keywords = input_text
-        keywords = TextUtils.parse_keywords(input_text) if input_text else []
+        stripped = input_text.strip() if input_text else ""
+        keywords = TextUtils.parse_keywords(stripped) if stripped else []
         if keywords:
             highlighter.highlight(self.window.active_view(), keywords)
         if self.scope == "file":
@@ -2055,7 +2334,7 @@ class QlnCommand(BaseSearchCommand):
             results = self._search_folders(keywords)
         else:
             results = []
-        if self.process_search_done(input_text, results):
+        if self.process_search_done(input_text, results, keywords):
             self._show_results(results, keywords)
 
     def _get_context_info(self):
@@ -2124,20 +2403,19 @@ class QlnOpenFilesCommand(BaseSearchCommand):
 
     def on_done(self, input_text):
         self.original_keywords = input_text
-        keywords = TextUtils.parse_keywords(input_text) if input_text else []
+        stripped = input_text.strip() if input_text else ""
+        keywords = TextUtils.parse_keywords(stripped) if stripped else []
         if keywords:
             for view in self.window.views():
                 if view and view.is_valid():
                     highlighter.highlight(view, keywords)
         search = SearchEngine(self.settings, "open_files", self.window)
         results = search.search(self.open_files, keywords, self.original_keywords)
-        if self.process_search_done(input_text, results):
+        if self.process_search_done(input_text, results, keywords):
             self._show_results(results, keywords)
 
     def clear_highlights(self):
-        for view in self.window.views():
-            if view:
-                highlighter.clear(view)
+        highlighter.clear_window(self.window)
 
     def highlight_keywords(self, keywords):
         view = self.window.active_view()
@@ -2152,36 +2430,12 @@ class QlnOpenFilesCommand(BaseSearchCommand):
 
 class QlnMenuCommand(sublime_plugin.WindowCommand):
     def run(self):
-        menu_items = [
-            ["📄 Search in Current File　　　　　　　1 🔍 Search Commands"],
-            ["📁 Search in Project　　　　　　　　　2 🔍 Search Commands"],
-            ["📂 Search in Folder　　　　　　　　　 3 🔍 Search Commands"],
-            ["📑 Search in Open Files　　　　　　　 4 🔍 Search Commands"],
-            ["🔄 Toggle Filters (Permanent)　　　　  5 🎛️ Filter Controls"],
-            ["⏱️ Toggle Filters (Temporary)　　　　  6 🎛️ Filter Controls"],
-            ["📊 Show Filter Status　　　　　　　　 7 🎛️ Filter Controls"],
-            ["📍 Set Search Folder　　　　　　　　  8 📁 Folder Settings"],
-            ["🗑️ Clear Search Folder　　　　　　　  9 📁 Folder Settings"]
-        ]
-        command_map = {
-            0: ("qln", {"scope": "file"}),
-            1: ("qln", {"scope": "project"}),
-            2: ("qln", {"scope": "folder"}),
-            3: ("qln_open_files", {}),
-            4: ("qln_toggle_extension_filters", {}),
-            5: ("qln_toggle_extension_filters_temporary", {}),
-            6: ("qln_show_filter_status", {}),
-            7: ("qln_set_search_folder", {}),
-            8: ("qln_clear_search_folder", {})
-        }
         def on_select(index):
-            if index == -1:
-                return
-            if index in command_map:
-                command, args = command_map[index]
+            if 0 <= index < len(MENU_COMMANDS):
+                command, args = MENU_COMMANDS[index]
                 self.window.run_command(command, args)
         self.window.show_quick_panel(
-            menu_items,
+            MENU_ITEMS,
             on_select,
             sublime.KEEP_OPEN_ON_FOCUS_LOST,
             0,
@@ -2191,87 +2445,98 @@ class QlnMenuCommand(sublime_plugin.WindowCommand):
 
 class QlnToggleExtensionFiltersCommand(sublime_plugin.WindowCommand):
     def run(self):
-        settings = Settings()
         current = settings.get("extension_filters", True)
         new_value = not current
         settings.update_user_settings("extension_filters", new_value)
         status = "enabled ✓" if new_value else "disabled ✗"
         sublime.status_message(UIText.get_status_message('filter_enabled', status=status, mode='permanently'))
-        if hasattr(self.window, 'extension_filters_temp_override'):
-            delattr(self.window, 'extension_filters_temp_override')
+        temp_filter_overrides.pop(self.window.id(), None)
 
 
 class QlnToggleExtensionFiltersTemporaryCommand(sublime_plugin.WindowCommand):
     def run(self):
-        settings = Settings()
-        if hasattr(self.window, 'extension_filters_temp_override'):
-            current = self.window.extension_filters_temp_override
-        else:
+        current = temp_filter_overrides.get(self.window.id())
+        if current is None:
             current = settings.get("extension_filters", True)
-        self.window.extension_filters_temp_override = not current
+        temp_filter_overrides[self.window.id()] = not current
         status = "enabled ✓" if not current else "disabled ✗"
         sublime.status_message(UIText.get_status_message('filter_enabled', status=status, mode='temporarily'))
 
 class QlnShowFilterStatusCommand(sublime_plugin.WindowCommand):
     def run(self):
-        settings = Settings()
-        global_enabled = settings.get("extension_filters", True)
-        file_scope = settings.get("extension_filters_file", None)
-        folder_scope = settings.get("extension_filters_folder", None)
-        project_scope = settings.get("extension_filters_project", None)
-        open_files_scope = settings.get("extension_filters_open_files", None)
-        has_temp_override = hasattr(self.window, 'extension_filters_temp_override')
-        temp_value = self.window.extension_filters_temp_override if has_temp_override else None
-        whitelist = settings.get("file_extensions", [])
-        blacklist = settings.get("file_extensions_blacklist", [])
-        status_lines = ["QuickLineNavigator Filter Status:"]
-        status_lines.append("-" * 40)
-        status_lines.append("Global Setting: {0}".format("Enabled" if global_enabled else "Disabled"))
+        values = settings.get_many({
+            "extension_filters": True,
+            "extension_filters_file": None,
+            "extension_filters_folder": None,
+            "extension_filters_project": None,
+            "extension_filters_open_files": None,
+            "file_extensions": [],
+            "file_extensions_blacklist": []
+        })
+        global_enabled = values["extension_filters"]
+        file_scope = values["extension_filters_file"]
+        folder_scope = values["extension_filters_folder"]
+        project_scope = values["extension_filters_project"]
+        open_files_scope = values["extension_filters_open_files"]
+        temp_value = temp_filter_overrides.get(self.window.id())
+        has_temp_override = temp_value is not None
+        whitelist = values["file_extensions"]
+        blacklist = values["file_extensions_blacklist"]
+        global_label = "Enabled" if global_enabled else "Disabled"
+        status_lines = [
+            "QuickLineNavigator Filter Status:",
+            "-" * 40,
+            "Global Setting: " + global_label
+        ]
         if has_temp_override:
             status_lines.append("Temporary Override: {0} (this session)".format(
                 "Enabled" if temp_value else "Disabled"))
-        status_lines.append("\nScope Settings:")
-        status_lines.append("  File Search: {0}".format(
-            self._format_scope_status(file_scope, global_enabled)))
-        status_lines.append("  Folder Search: {0}".format(
-            self._format_scope_status(folder_scope, global_enabled)))
-        status_lines.append("  Project Search: {0}".format(
-            self._format_scope_status(project_scope, global_enabled)))
-        status_lines.append("  Open Files Search: {0}".format(
-            self._format_scope_status(open_files_scope, global_enabled)))
+        status_lines.extend([
+            "\nScope Settings:",
+            "  File Search: " + self._format_scope_status(file_scope, global_label),
+            "  Folder Search: " + self._format_scope_status(folder_scope, global_label),
+            "  Project Search: " + self._format_scope_status(project_scope, global_label),
+            "  Open Files Search: " + self._format_scope_status(open_files_scope, global_label)
+        ])
         if whitelist:
             status_lines.append("\nWhitelist Extensions:")
-            for ext in whitelist[:10]:
-                status_lines.append("  - {0}".format(ext))
+            status_lines.extend("  - {0}".format(ext) for ext in whitelist[:10])
             if len(whitelist) > 10:
                 status_lines.append("  ... and {0} more".format(len(whitelist) - 10))
         else:
             status_lines.append("\nWhitelist: Empty (all non-blacklisted files)")
         if blacklist:
             status_lines.append("\nBlacklist Extensions: {0} items".format(len(blacklist)))
-        output_view = self.window.create_output_panel("filter_status")
+        output_view = self.window.find_output_panel("filter_status")
+        if output_view is None:
+            output_view = self.window.create_output_panel("filter_status")
+        else:
+            output_view.set_read_only(False)
+            output_view.run_command("select_all")
+            output_view.run_command("right_delete")
         output_view.run_command("append", {"characters": "\n".join(status_lines)})
+        output_view.set_read_only(True)
         self.window.run_command("show_panel", {"panel": "output.filter_status"})
 
-    def _format_scope_status(self, scope_value, global_value):
+    def _format_scope_status(self, scope_value, global_label):
         if scope_value is None:
-            return "Inherit (currently {0})".format("Enabled" if global_value else "Disabled")
+            return "Inherit (currently {0})".format(global_label)
         return "Enabled" if scope_value else "Disabled"
 
 
 class QlnSetSearchFolderCommand(sublime_plugin.WindowCommand):
     def run(self):
-        settings = Settings()
         current_folder = settings.get("search_folder_path", "")
+        basename = os.path.basename
         suggestions = []
         if current_folder:
-            suggestions.append(["User config - {0}".format(os.path.basename(current_folder)), current_folder])
-        for folder in self.window.folders():
-            suggestions.append(["Project dir - " + os.path.basename(folder), folder])
+            suggestions.append(["User config - {0}".format(basename(current_folder)), current_folder])
+        suggestions.extend(["Project dir - " + basename(folder), folder] for folder in self.window.folders())
         view = self.window.active_view()
-        if view and view.file_name():
-            file_dir = os.path.dirname(view.file_name())
-            suggestions.append(["Current file's folder - " + os.path.basename(file_dir), file_dir])
+        file_name = view.file_name() if view else None
+        if file_name:
+            file_dir = os.path.dirname(file_name)
+            suggestions.append(["Current file's folder - " + basename(file_dir), file_dir])
         suggestions.append(["Enter path manually...", "__choose_me_to_modify__"])
         def on_select(index):
             if index == -1:
@@ -2292,22 +2557,21 @@ class QlnSetSearchFolderCommand(sublime_plugin.WindowCommand):
     def _set_folder(self, path):
         if not path:
             return
-        path = os.path.expanduser(path)
-        path = os.path.expandvars(path)
-        if not os.path.exists(path):
+        path = os.path.expandvars(os.path.expanduser(path))
+        try:
+            mode = os.stat(path).st_mode
+        except OSError:
             sublime.error_message("Folder does not exist: {0}".format(path))
             return
-        if not os.path.isdir(path):
+        if not stat.S_ISDIR(mode):
             sublime.error_message("Path is not a folder: {0}".format(path))
             return
-        settings = Settings()
         settings.update_user_settings("search_folder_path", path)
         sublime.status_message("Search folder set to: {0}".format(path))
 
 
 class QlnClearSearchFolderCommand(sublime_plugin.WindowCommand):
     def run(self):
-        settings = Settings()
         current_folder = settings.get("search_folder_path", "")
         if not current_folder:
             sublime.status_message(UIText.get_status_message('search_folder_set', path="None"))
@@ -2323,43 +2587,86 @@ class QuickLineNavigatorEventListener(sublime_plugin.EventListener):
     def __init__(self):
         super().__init__()
         self.last_row = {}
+        self.last_point = {}
         self.border_timers = {}
 
     def on_load_async(self, view):
-        highlighter.sweep_view(view, max_keys=128)
+        highlighter.sweep_view(view)
+        view_cache.invalidate_index()
+
+    def on_new_async(self, view):
+        view_cache.invalidate_index()
+
+    def on_post_save_async(self, view):
+        view_cache.invalidate_index()
+
+    def on_close(self, view):
+        segment_highlight_views.pop(view.id(), None)
+        self.last_row.pop(view.id(), None)
+        self.last_point.pop(view.id(), None)
+        self.border_timers.pop(view.id(), None)
+        highlighter.forget(view.id())
+        view_cache.invalidate_index()
 
     def on_selection_modified(self, view):
-        if not view or not view.is_valid():
-            return
-        if keyword_state_manager.has_active_panel():
+        if not view or keyword_state_manager.has_active_panel():
             return
         view_id = view.id()
         try:
-            current_row = view.rowcol(view.sel()[0].begin())[0] if view.sel() else -1
-        except:
+            sel = view.sel()
+            point = sel[0].begin() if sel else -1
+        except (IndexError, AttributeError):
+            point = -1
+        if point == self.last_point.get(view_id):
+            return
+        self.last_point[view_id] = point
+        try:
+            current_row = view.rowcol(point)[0] if point >= 0 else -1
+        except (IndexError, AttributeError, ValueError):
             current_row = -1
         last_row = self.last_row.get(view_id, -1)
         if current_row != last_row and last_row != -1:
-            if view_id in self.border_timers:
-                self.border_timers[view_id] = None
+            token = (self.border_timers.get(view_id) or 0) + 1
+            self.border_timers[view_id] = token
+            segment_stamp = segment_highlight_views.get(view_id)
+            stamps = dict(highlighter.stamps)
+            sublime.set_timeout(
+                lambda: self._clear_after_row_change(view, view_id, token, segment_stamp, stamps), 30
+            )
+        self.last_row[view_id] = current_row
+
+    def _clear_after_row_change(self, view, view_id, token, segment_stamp, stamps):
+        if self.border_timers.get(view_id) != token:
+            return
+        self.border_timers.pop(view_id, None)
+        if segment_stamp is not None and segment_highlight_views.get(view_id) == segment_stamp and view.is_valid():
+            segment_highlight_views.pop(view_id, None)
             segment_key = "QuickLineNavSegment_{0}".format(view_id)
             border_key = segment_key + "_border"
             try:
                 view.erase_regions(segment_key)
                 view.erase_regions(border_key)
-            except:
+            except Exception:
                 pass
-            highlighter.clear_all()
-        self.last_row[view_id] = current_row
+        if stamps:
+            highlighter.clear_stale(stamps)
 
     def on_window_command(self, window, command_name, args):
-        if command_name == "hide_overlay" or command_name == "hide_panel":
+        if (command_name == "hide_overlay" or command_name == "hide_panel") and highlighter.has_highlights():
             highlighter.clear_all()
 
 
 def plugin_loaded():
     settings_path = os.path.join(sublime.packages_path(), "User", SETTINGS_FILE)
-    if not os.path.exists(settings_path):
+    try:
+        os.makedirs(os.path.dirname(settings_path), exist_ok=True)
+        fd = os.open(settings_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        fd = None
+    except OSError as e:
+        print("Error creating default settings {}: {}".format(settings_path, e))
+        fd = None
+    if fd is not None:
         default_settings = {
             "default_search_scope": "file",
             "show_line_numbers": True,
@@ -2372,14 +2679,16 @@ def plugin_loaded():
             "extension_filters_open_files": False,
             "max_display_length": 120,
             "file_extensions": [],
-            "file_extensions_blacklist": [ext.lstrip('.') for ext in DEFAULT_BLACKLIST]
+            "file_extensions_blacklist": list(DEFAULT_BLACKLIST_NAMES)
         }
         try:
-            os.makedirs(os.path.dirname(settings_path), exist_ok=True)
-            with open(settings_path, 'w', encoding='utf-8') as f:
-                json.dump(default_settings, f, indent=4, ensure_ascii=False)
-        except:
-            pass
+            os.write(fd, json.dumps(
+                default_settings, indent=4, ensure_ascii=False, separators=(",", ": ")
+            ).encode("utf-8"))
+        except OSError as e:
+            print("Error writing default settings {}: {}".format(settings_path, e))
+        finally:
+            os.close(fd)
     try:
         for window in sublime.windows():
             for v in window.views():
@@ -2391,8 +2700,12 @@ def plugin_loaded():
 def plugin_unloaded():
     highlighter.clear_all()
     view_cache.clear()
+    Settings.release()
+    UgrepExecutor.invalidate()
 
 keyword_state_manager = KeywordStateManager()
+temp_filter_overrides = {}
+segment_highlight_views = {}
 settings = Settings()
 ugrep = UgrepExecutor()
 highlighter = Highlighter()